@@ -12,8 +12,14 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from typing import TYPE_CHECKING, Any, Callable, Optional, Union
+
+import pytorch_lightning as pl
 import torch
-from pytorch_lightning.plugins.precision import MixedPrecisionPlugin
+from pytorch_lightning.plugins.precision import MixedPrecision, MixedPrecisionPlugin
+
+if TYPE_CHECKING:
+    from nemo.core.optim import MainParamsOptimizerWrapper
 
 
 class NeMoMixedPrecisionPlugin(MixedPrecisionPlugin):
@@ -21,3 +27,59 @@ class NeMoMixedPrecisionPlugin(MixedPrecisionPlugin):
         super().__init__(precision=16)
 
         self.scaler = torch.cuda.amp.GradScaler(init_scale=init_scale, growth_interval=growth_interval)
+
+
+def megatron_bf16_optimizer_step(
+    plugin: MixedPrecision,
+    optimizer: "MainParamsOptimizerWrapper",
+    model: Union[pl.LightningModule, torch.nn.Module],
+    closure: Callable[[], Any],
+    **kwargs: Any,
+) -> Any:
+    """Optimizer step of the Megatron half precision plugins without a grad scaler (BF16)."""
+    assert optimizer.fp32_grad_accumulation, "BF16 uses FP32 grad accumulation"
+    _ = closure()
+    plugin._after_closure(model, optimizer)
+    return optimizer.step(**kwargs)
+
+
+def megatron_fp16_optimizer_step(
+    plugin: MixedPrecision,
+    optimizer: "MainParamsOptimizerWrapper",
+    model: Union[pl.LightningModule, torch.nn.Module],
+    closure: Callable[[], Any],
+    **kwargs: Any,
+) -> None:
+    """Optimizer step of the Megatron half precision plugins with the grad scaler of `plugin` (FP16)."""
+    assert not optimizer.fp32_grad_accumulation, "FP16 uses FP16 grad accumulation"
+    closure_result = closure()
+
+    # TODO: Add an option for merged all-reduce
+
+    # cast fp16 grads to fp32 and copy to main grads, which are used for unscale and param update.
+    optimizer.copy_model_grads_to_main_grads()
+    # `unscale` after the closure is executed but before the `on_before_optimizer_step` hook.
+    # unscale main (fp32) gradients
+    plugin.scaler.unscale_(optimizer)
+    skipped_backward = closure_result is None
+    # in manual optimization, the closure does not return a value
+    should_step = not isinstance(model, pl.LightningModule) or not model.automatic_optimization or not skipped_backward
+    # Let the inf flag travel to the host while the `_after_closure` hooks run on the host.
+    prefetch_found_inf = getattr(plugin.scaler, "prefetch_found_inf", None)
+    if should_step and prefetch_found_inf is not None:
+        prefetch_found_inf(optimizer)
+    plugin._after_closure(model, optimizer)
+    if should_step:
+        # note: the scaler will skip the `optimizer.step` if nonfinite gradients are found
+        plugin.scaler.step(optimizer, **kwargs)
+        plugin.scaler.update()
+
+
+def megatron_optimizer_step_fn(scaler: Optional[torch.cuda.amp.GradScaler]) -> Callable[..., Any]:
+    """Select the Megatron optimizer step for a plugin once, based on whether it has a grad scaler.
+
+    Plugins call this once at construction instead of checking the scaler on every step. The
+    returned step is bound to that choice, so it has to be selected again if ``plugin.scaler`` is
+    later replaced by ``None`` or by a scaler.
+    """
+    return megatron_bf16_optimizer_step if scaler is None else megatron_fp16_optimizer_step
@@ -39,6 +39,7 @@ class StableDiffusion(Txt2ImgGuidanceBase):
         cfg, state_dict = self.load_config_and_state_from_nemo(checkpoint)
 
         cfg.precision = precision
+        self.autocast_dtype = torch.bfloat16 if precision in ['bf16', 'bf16-mixed'] else torch.half
         cfg.ckpt_path = None
         cfg.unet_config.from_pretrained = None
         cfg.first_stage_config.from_pretrained = None
@@ -63,8 +64,12 @@ class StableDiffusion(Txt2ImgGuidanceBase):
     def get_text_embeds(self, prompt):
         return self.text_encoder(prompt)
 
-    @torch.autocast(device_type="cuda")
     def train_step(self, text_embeddings, pred_rgb, guidance_scale=100, as_latent=False):
+        # Not a decorator, which would fix the autocast dtype once, when this module is imported
+        with torch.autocast(device_type="cuda", dtype=self.autocast_dtype):
+            return self._train_step(text_embeddings, pred_rgb, guidance_scale=guidance_scale, as_latent=as_latent)
+
+    def _train_step(self, text_embeddings, pred_rgb, guidance_scale=100, as_latent=False):
 
         if as_latent:
             latents = F.interpolate(pred_rgb, (64, 64), mode='bilinear', align_corners=False) * 2 - 1
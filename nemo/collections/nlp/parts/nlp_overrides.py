@@ -64,6 +64,7 @@ except ImportError:
     # since PyTorch 2.3 the path has changed
     from torch.amp.grad_scaler import _refresh_per_optimizer_state
 
+from nemo.collections.common.parts.ptl_overrides import megatron_optimizer_step_fn
 from nemo.collections.multimodal.modules.stable_diffusion.attention import BasicTransformerBlock
 from nemo.collections.nlp.modules.common.megatron.module import Float16Module
 from nemo.collections.nlp.modules.common.megatron.transformer import AutocastTransformerLayer, ParallelTransformerLayer
@@ -1286,18 +1287,17 @@ class PipelineMixedPrecisionPlugin(MixedPrecisionPlugin):
                 f" but {precision} found"
             )
         super().__init__(plugin_precision, device, scaler=scaler)
-        dtype = None
-        if precision in ['16-mixed', '16', 16]:
-            dtype = torch.float16
-        elif precision in ['bf16-mixed', 'bf16']:
-            dtype = torch.bfloat16
-
-        torch.set_autocast_gpu_dtype(dtype)
+        self.dtype = torch.float16 if plugin_precision == '16-mixed' else torch.bfloat16
 
     @contextmanager
     def forward_context(self) -> Generator[None, None, None]:
-        """Have the PTL context manager do nothing."""
-        yield
+        """Have the PTL context manager not autocast.
+
+        It only scopes the autocast dtype, so that autocast regions opened in the step without a dtype
+        (e.g. ``torch.autocast("cuda")``) use the precision of this plugin.
+        """
+        with torch.autocast(self.device, dtype=self.dtype, enabled=torch.is_autocast_enabled()):
+            yield
 
 
 class FSDPMixedPrecisionPlugin(FSDPPrecision):
@@ -1548,15 +1548,16 @@ class MegatronHalfPrecisionPlugin(MixedPrecisionPlugin):
     def __init__(
         self, precision: Union[str, int], device: str, scaler: Optional[torch.cuda.amp.GradScaler] = None
     ) -> None:
-        super().__init__(precision, device, scaler)
-        dtype = None
         # MixedPrecisionPlugin class in PTL >= 2.0 takes only "16-mixed" or "bf16-mixed" for precision arg
         if precision == "16-mixed":
             dtype = torch.float16
         elif precision == "bf16-mixed":
             dtype = torch.bfloat16
-
-        torch.set_autocast_gpu_dtype(dtype)
+        else:
+            raise RuntimeError(f"precision expected to be one of: ['16-mixed', 'bf16-mixed'] but {precision} found")
+        super().__init__(precision, device, scaler)
+        self.dtype = dtype
+        self._megatron_optimizer_step = megatron_optimizer_step_fn(self.scaler)
 
     def optimizer_step(
         self,
@@ -1569,37 +1570,16 @@ class MegatronHalfPrecisionPlugin(MixedPrecisionPlugin):
             optimizer, MainParamsOptimizerWrapper
         ), "MegatronHalfPrecisionPlugin supports only the optimizer with master parameters"
 
-        if self.scaler is None:
-            assert optimizer.fp32_grad_accumulation, "BF16 uses FP32 grad accumulation"
-            _ = closure()
-            self._after_closure(model, optimizer)
-            return optimizer.step(**kwargs)
-
-        assert not optimizer.fp32_grad_accumulation, "FP16 uses FP16 grad accumulation"
-        closure_result = closure()
-
-        # TODO: Add an option for merged all-reduce
-
-        # cast fp16 grads to fp32 and copy to main grads, which are used for unscale and param update
-        optimizer.copy_model_grads_to_main_grads()
-        # `unscale` after the closure is executed but before the `on_before_optimizer_step` hook.
-        # unscale main (fp32) gradients
-        self.scaler.unscale_(optimizer)
-        self._after_closure(model, optimizer)
-        skipped_backward = closure_result is None
-        # in manual optimization, the closure does not return a value
-        if not isinstance(model, pl.LightningModule) or not model.automatic_optimization or not skipped_backward:
-            # note: the scaler will skip the `optimizer.step` if nonfinite gradients are found
-            self.scaler.step(optimizer, **kwargs)
-            self.scaler.update()
+        return self._megatron_optimizer_step(self, optimizer, model, closure, **kwargs)
 
     @contextmanager
     def forward_context(self) -> Generator[None, None, None]:
-        """No explicit precision casting. Inputs are supposed to be manually casted"""
-        try:
+        """No explicit precision casting. Inputs are supposed to be manually casted.
+
+        Autocast regions opened in the step without a dtype use the precision of this plugin.
+        """
+        with torch.autocast(self.device, dtype=self.dtype, enabled=torch.is_autocast_enabled()):
             yield
-        finally:
-            pass
 
 
 class GlobalBatchDataFetcher(_DataFetcher):
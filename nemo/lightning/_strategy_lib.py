@@ -178,6 +178,8 @@ class GradScaler(torch.cuda.amp.GradScaler):
         self.optimizer_update_skipped: Optional[bool] = None
         self.hysteresis = hysteresis
         self._hysteresis_tracker = self.hysteresis
+        # Persistent pinned host buffers, per optimizer id, that receive the model-parallel reduced inf flag
+        self._found_inf_cpu: Dict[int, torch.Tensor] = {}
 
     def _unscale_grads_(self, optimizer, *args):
         if getattr(optimizer, "_custom_amp_unscale_grads", False):
@@ -185,18 +187,54 @@ class GradScaler(torch.cuda.amp.GradScaler):
         else:
             return super()._unscale_grads_(optimizer, *args)
 
-    def _maybe_opt_step(self, optimizer, optimizer_state, *args, **kwargs):
+    def prefetch_found_inf(self, optimizer) -> None:
+        """
+        Start the model-parallel reduction of the inf flags of `optimizer` and their copy to the host.
+        Call right after `unscale_(optimizer)`: the copy then overlaps with host work done before
+        `step`, which only waits for it instead of issuing a blocking read.
+        """
+        if not self._enabled:
+            return
+
+        self._copy_found_inf_to_cpu(optimizer, self._per_optimizer_states[id(optimizer)])
+
+    def _copy_found_inf_to_cpu(self, optimizer, optimizer_state) -> None:
         from megatron.core import parallel_state
 
-        retval = None
-        found_inf = torch.cuda.FloatTensor([sum(v.item() for v in optimizer_state["found_inf_per_device"].values())])
+        found_inf_per_device = optimizer_state.get("found_inf_per_device")
+        if not found_inf_per_device:
+            # No gradients were unscaled, so there is nothing to reduce or copy.
+            return
+
+        # Combine the per-device flags on the scale's device instead of reading each one back to the host.
+        found_infs = [
+            found_inf.to(device=self._scale.device, non_blocking=True).reshape(1)
+            for found_inf in found_inf_per_device.values()
+        ]
+        found_inf = torch.cat(found_infs).sum(dim=0, keepdim=True)
 
         # Update across all model parallel instances.
         torch.distributed.all_reduce(
             found_inf, op=torch.distributed.ReduceOp.MAX, group=parallel_state.get_model_parallel_group(),
         )
 
-        if found_inf.item() == 0:
+        # Single asynchronous device-to-host transfer into a pinned buffer that is reused across steps.
+        found_inf_cpu = self._found_inf_cpu.get(id(optimizer))
+        if found_inf_cpu is None:
+            found_inf_cpu = self._found_inf_cpu[id(optimizer)] = torch.zeros(1, dtype=torch.float32).pin_memory()
+        found_inf_cpu.copy_(found_inf, non_blocking=True)
+
+        copied = torch.cuda.Event()
+        copied.record()
+        optimizer_state["found_inf_cpu_copied"] = copied
+
+    def _maybe_opt_step(self, optimizer, optimizer_state, *args, **kwargs):
+        retval = None
+        if "found_inf_cpu_copied" not in optimizer_state:
+            self._copy_found_inf_to_cpu(optimizer, optimizer_state)
+        optimizer_state["found_inf_cpu_copied"].synchronize()
+
+        if self._found_inf_cpu[id(optimizer)].item() == 0:
             retval = optimizer.step(*args, **kwargs)
             self.optimizer_update_skipped = False
         else:
@@ -12,8 +12,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import fnmatch
+import weakref
+from collections import defaultdict
 from contextlib import contextmanager
-from typing import Any, Callable, Generator, List, Literal, Tuple, TypeVar, Union
+from typing import Any, Callable, Dict, Generator, List, Literal, Optional, Tuple, TypeVar, Union
 
 import pytorch_lightning as pl
 import torch
@@ -21,53 +24,254 @@ from pytorch_lightning.plugins.precision import MixedPrecision
 from torch.nn import Module
 from torch.optim import Optimizer
 
+from nemo.core.optim import MainParamsOptimizerWrapper
 from nemo.lightning._strategy_lib import GradScaler
 
+try:
+    from megatron.core.transformer.module import float16_to_fp32
+
+    HAVE_MEGATRON_CORE = True
+
+except (ImportError, ModuleNotFoundError):
+
+    HAVE_MEGATRON_CORE = False
+
+try:
+    import transformer_engine.pytorch as te
+
+    HAVE_TE = True
+
+except (ImportError, ModuleNotFoundError):
+
+    HAVE_TE = False
+
 AnyT = TypeVar("AnyT")
+ConfigT = TypeVar("ConfigT")
+
+
+def _to_half(val: torch.Tensor) -> torch.Tensor:
+    return val.half()
+
+
+def _to_bf16(val: torch.Tensor) -> torch.Tensor:
+    return val.bfloat16()
+
+
+# MixedPrecision in PTL >= 2.0 takes only "16-mixed" or "bf16-mixed" for precision arg
+_DTYPE_TABLE: Dict[str, Tuple[torch.dtype, Callable[[torch.Tensor], torch.Tensor]]] = {
+    "16-mixed": (torch.float16, _to_half),
+    "bf16-mixed": (torch.bfloat16, _to_bf16),
+}
+
+# FP8 precisions keep the matching half precision for everything that does not run in FP8
+_FP8_PRECISIONS: Dict[str, str] = {
+    "bf16-with-fp8-mixed": "bf16-mixed",
+    "fp16-with-fp8-mixed": "16-mixed",
+    "bf16-with-fp8-current-scaling-mixed": "bf16-mixed",
+}
+
+
+# TransformerConfig fields set for each FP8 precision. megatron-core enters ``te.fp8_autocast`` (and
+# recomputes activations with ``te_checkpoint``) itself from these. "hybrid" is E4M3 in forward and
+# E5M2 in backward.
+_FP8_CONFIGS: Dict[str, Dict[str, Any]] = {
+    "bf16-with-fp8-mixed": {
+        "fp8": "hybrid",
+        "fp8_margin": 0,
+        "fp8_amax_history_len": 1024,
+        "fp8_amax_compute_algo": "max",
+    },
+    "fp16-with-fp8-mixed": {
+        "fp8": "hybrid",
+        "fp8_margin": 0,
+        "fp8_amax_history_len": 1024,
+        "fp8_amax_compute_algo": "max",
+    },
+    "bf16-with-fp8-current-scaling-mixed": {"fp8": "hybrid", "fp8_recipe": "tensorwise"},
+}
+
+
+def _fp8_disabled_pre_hook(module: Module, args: Any) -> None:
+    context = te.fp8_autocast(enabled=False)
+    context.__enter__()
+    module._fp8_disabled_contexts.append(context)
+
+
+def _fp8_disabled_post_hook(module: Module, args: Any, output: Any) -> None:
+    module._fp8_disabled_contexts.pop().__exit__(None, None, None)
+
+
+def _disable_fp8_forward(module: Module) -> None:
+    """Run the forward of ``module`` with FP8 disabled, through a pair of forward hooks."""
+    if hasattr(module, "_fp8_disabled_contexts"):
+        return
+
+    # A stack, so that reentrant forwards (e.g. activation recomputation) are unwound in order
+    module._fp8_disabled_contexts = []
+    module.register_forward_pre_hook(_fp8_disabled_pre_hook)
+    module.register_forward_hook(_fp8_disabled_post_hook, always_call=True)
+
+
+def _collect_fp32_tensors(data: Any, tensors: List[torch.Tensor]) -> None:
+    if isinstance(data, (list, tuple)):
+        for item in data:
+            _collect_fp32_tensors(item, tensors)
+    elif isinstance(data, torch.Tensor) and data.dtype == torch.float32:
+        tensors.append(data)
+
+
+def _replace_tensors(data: Any, replacements: Dict[int, torch.Tensor]) -> Any:
+    if isinstance(data, (list, tuple)):
+        rtn = [_replace_tensors(item, replacements) for item in data]
+        return tuple(rtn) if isinstance(data, tuple) else rtn
+    return replacements.get(id(data), data)
+
+
+@torch.no_grad()
+def _foreach_cast_tensors(tensors: List[torch.Tensor], dtype: torch.dtype) -> List[torch.Tensor]:
+    """Cast ``tensors`` to ``dtype`` with one flat allocation and one ``torch._foreach_copy_`` per device."""
+    tensors_per_device: Dict[torch.device, List[torch.Tensor]] = defaultdict(list)
+    for tensor in tensors:
+        tensors_per_device[tensor.device].append(tensor)
+
+    casted: Dict[int, torch.Tensor] = {}
+    for device, srcs in tensors_per_device.items():
+        sizes = [t.numel() for t in srcs]
+        flat = torch.empty(sum(sizes), dtype=dtype, device=device)
+        dsts = [split.view_as(t) for split, t in zip(torch.split(flat, sizes), srcs)]
+        torch._foreach_copy_(dsts, srcs)
+        casted.update((id(src), dst) for src, dst in zip(srcs, dsts))
+
+    return [casted[id(t)] for t in tensors]
+
+
+# Upper bound on the casted bytes allocated at once; each bucket is rebound before the next one is
+# cast, so the fp32 originals are released progressively instead of all being alive at the peak
+_CAST_BUCKET_BYTES = 256 * 1024 * 1024
+
+
+def _cast_buckets(tensors: List[torch.Tensor], dtype: torch.dtype) -> Generator[List[torch.Tensor], None, None]:
+    itemsize = torch.empty((), dtype=dtype).element_size()
+    bucket: List[torch.Tensor] = []
+    bucket_bytes = 0
+    for tensor in tensors:
+        nbytes = tensor.numel() * itemsize
+        if bucket and bucket_bytes + nbytes > _CAST_BUCKET_BYTES:
+            yield bucket
+            bucket, bucket_bytes = [], 0
+        bucket.append(tensor)
+        bucket_bytes += nbytes
+    if bucket:
+        yield bucket
+
+
+def _foreach_cast_bucket(tensors: List[torch.Tensor], dtype: torch.dtype) -> List[torch.Tensor]:
+    casted = [torch.empty_like(t, dtype=dtype) for t in tensors]
+    torch._foreach_copy_(casted, tensors)
+    return casted
+
+
+def _needs_module_apply(module: Module) -> bool:
+    # Rebinding ``.data`` is only equivalent to ``Module._apply`` for the default conversion semantics
+    future = torch.__future__
+    if future.get_overwrite_module_params_on_conversion():
+        return True
+    if getattr(future, "get_swap_module_params_on_conversion", lambda: False)():
+        return True
+    return any(type(submodule)._apply is not Module._apply for submodule in module.modules())
+
+
+@torch.no_grad()
+def _foreach_cast_module_(module: Module, dtype: torch.dtype) -> Module:
+    """Cast the floating point parameters, their gradients and buffers of ``module`` to ``dtype`` in place.
+
+    Instead of dispatching one ``aten::to`` per tensor like ``module.to(dtype)``, the tensors are
+    cast with one ``torch._foreach_copy_`` per bucket of at most ``_CAST_BUCKET_BYTES``. Like with
+    ``module.to(dtype)``, every casted tensor gets a storage of its own, so saving a subset of the
+    state dict or dropping a tensor does not keep the rest of its bucket around. Falls back to
+    ``module.to(dtype)`` when a submodule overrides ``_apply`` or a non-default conversion mode is
+    enabled.
+
+    """
+    if not hasattr(torch, "_foreach_copy_") or _needs_module_apply(module):
+        return module.to(dtype)
+
+    params = [p for p in module.parameters() if p.is_floating_point() and p.dtype != dtype]
+    # Like ``Module._apply``, a parameter is rebound before its gradient
+    tensors = list(params)
+    tensors.extend(p.grad for p in params if p.grad is not None)
+    tensors.extend(b for b in module.buffers() if b.is_floating_point() and b.dtype != dtype)
+    if not tensors:
+        return module
+
+    for bucket in _cast_buckets(tensors, dtype):
+        casted_tensors = _foreach_cast_bucket(bucket, dtype)
+        for tensor, casted in zip(bucket, casted_tensors):
+            tensor.data = casted
+        del casted_tensors
+
+    return module
 
 
 class MegatronMixedPrecision(MixedPrecision):
     def __init__(
         self,
-        precision: Literal["16-mixed", "bf16-mixed"],
+        precision: Literal[
+            "16-mixed",
+            "bf16-mixed",
+            "bf16-with-fp8-mixed",
+            "fp16-with-fp8-mixed",
+            "bf16-with-fp8-current-scaling-mixed",
+        ],
         amp_O2: bool = False,
         device="cuda",
+        fp8_skip_layer_names: Optional[List[str]] = None,
     ) -> None:
-        if precision == "bf16-mixed":
+        if not HAVE_MEGATRON_CORE:
+            raise ImportError(
+                "megatron-core was not found. Please see the NeMo README for installation instructions: https://github.com/NVIDIA/NeMo#megatron-gpt."
+            )
+
+        # Imported here so that importing nemo.lightning does not load nemo.collections.common
+        from nemo.collections.common.parts.ptl_overrides import megatron_optimizer_step_fn
+
+        half_precision = _FP8_PRECISIONS.get(precision, precision)
+        if half_precision not in _DTYPE_TABLE:
+            raise ValueError(
+                f"precision must be one of {[*_DTYPE_TABLE, *_FP8_PRECISIONS]}, but {precision!r} found"
+            )
+        if precision in _FP8_PRECISIONS and not HAVE_TE:
+            raise ImportError(
+                f"transformer_engine was not found, it is required for precision {precision!r}. "
+                "Please see the NeMo README for installation instructions: https://github.com/NVIDIA/NeMo#megatron-gpt."
+            )
+        dtype, float16_convertor = _DTYPE_TABLE[half_precision]
+
+        # FP16 still needs loss scaling when combined with FP8
+        if half_precision == "bf16-mixed":
             scaler = None
         else:
             scaler = GradScaler(init_scale=2**32, growth_interval=1000, hysteresis=2)
 
-        super().__init__(precision, device, scaler)
-
-        # MixedPrecisionPlugin class in PTL >= 2.0 takes only "16-mixed" or "bf16-mixed" for precision arg
-        if precision == "16-mixed":
-            dtype = torch.float16
-
-            def float16_convertor(val):
-                return val.half()
-
-        elif precision == "bf16-mixed":
-            dtype = torch.bfloat16
-
-            def float16_convertor(val):
-                return val.bfloat16()
-
-        else:
-            raise ValueError("precision must be '16-mixed' or 'bf16-mixed'")
+        super().__init__(half_precision, device, scaler)
 
         self.dtype = dtype
-        torch.set_autocast_gpu_dtype(dtype)
+        self.fp8_config = _FP8_CONFIGS.get(precision)
+        self.fp8_skip_layer_names = fp8_skip_layer_names or []
         self.float16_convertor = float16_convertor
         self.amp_O2 = amp_O2
+        self._megatron_optimizer_step = megatron_optimizer_step_fn(self.scaler)
+        # Wrappers already built by `convert_optimizer`, keyed by the id of the wrapped optimizer
+        self._wrapped_optims: "weakref.WeakValueDictionary[int, MainParamsOptimizerWrapper]" = (
+            weakref.WeakValueDictionary()
+        )
 
     def connect(
         self, model: Module, optimizers: List[Optimizer], lr_schedulers: List[Any]
     ) -> Tuple[Module, List[Optimizer], List[Any]]:
         """Connects this plugin to the accelerator and the training process."""
-        from nemo.core.optim import MainParamsOptimizerWrapper
-
-        if not optimizers or not self.amp_O2 or isinstance(optimizers[0], MainParamsOptimizerWrapper):
+        # `convert_optimizer` already leaves wrapped optimizers and non-O2 setups untouched
+        if not optimizers or not self.amp_O2:
             return model, optimizers, lr_schedulers
 
         _optimizers = [*optimizers]
@@ -80,11 +284,29 @@ class MegatronMixedPrecision(MixedPrecision):
 
         This is optional and depends on the precision limitations during optimization.
 
+        With an FP8 precision, the megatron-core configs of the submodules are converted with
+        `convert_config`, and submodules whose name matches one of `fp8_skip_layer_names`
+        (fnmatch patterns, e.g. ``"*.layers.0"``) run their forward with FP8 disabled.
+
         """
-        if self.precision == "bf16-mixed":
-            return module.bfloat16()
-        if self.precision == "16-mixed":
-            return module.half()
+        if self.precision in ("bf16-mixed", "16-mixed"):
+            module = _foreach_cast_module_(module, self.dtype)
+
+        if self.fp8_config is not None:
+            from megatron.core.transformer.transformer_config import TransformerConfig
+
+            configs = {
+                id(m.config): m.config
+                for m in module.modules()
+                if isinstance(getattr(m, "config", None), TransformerConfig)
+            }
+            for config in configs.values():
+                self.convert_config(config)
+
+        if self.fp8_config is not None and self.fp8_skip_layer_names:
+            for name, submodule in module.named_modules():
+                if any(fnmatch.fnmatch(name, pattern) for pattern in self.fp8_skip_layer_names):
+                    _disable_fp8_forward(submodule)
 
         return module
 
@@ -94,16 +316,22 @@ class MegatronMixedPrecision(MixedPrecision):
         This is optional and depends on the precision limitations during optimization.
 
         """
-        from nemo.core.optim import MainParamsOptimizerWrapper
-
         if isinstance(optimizer, MainParamsOptimizerWrapper) or not self.amp_O2:
             return optimizer
 
-        return MainParamsOptimizerWrapper(
+        # The wrapper keeps `optimizer` alive, so its id cannot be reused while the entry exists.
+        wrapped = self._wrapped_optims.get(id(optimizer))
+        if wrapped is not None:
+            return wrapped
+
+        wrapped = MainParamsOptimizerWrapper(
             optimizer,
             fp32_grad_accum=True,
             contiguous_grad_bucket=True,
         )
+        self._wrapped_optims[id(optimizer)] = wrapped
+
+        return wrapped
 
     def convert_input(self, data: AnyT) -> AnyT:
         """Convert model inputs (forward) to the floating point precision type of this plugin.
@@ -111,10 +339,28 @@ class MegatronMixedPrecision(MixedPrecision):
         Note: MegatronStrategy will take care of only doing this when:
             parallel_state.is_pipeline_first_stage()
 
+        Like megatron-core's ``fp32_to_float16``, only fp32 tensors nested in lists and tuples are cast,
+        but all of them are cast together with ``torch._foreach_copy_`` instead of one op per tensor.
+
         """
-        from megatron.core.transformer.module import fp32_to_float16
+        # Fast paths: a bare tensor needs no batching, and nothing but lists/tuples is traversed.
+        if isinstance(data, torch.Tensor):
+            return self.float16_convertor(data) if data.dtype == torch.float32 else data
+        if not isinstance(data, (list, tuple)):
+            return data
+
+        tensors: List[torch.Tensor] = []
+        _collect_fp32_tensors(data, tensors)
+        if not tensors:
+            return data
+
+        # Inputs that require grad go through the differentiable convertor.
+        if not hasattr(torch, "_foreach_copy_") or any(t.requires_grad for t in tensors):
+            casted = [self.float16_convertor(t) for t in tensors]
+        else:
+            casted = _foreach_cast_tensors(tensors, self.dtype)
 
-        return fp32_to_float16(data, self.float16_convertor)
+        return _replace_tensors(data, {id(src): dst for src, dst in zip(tensors, casted)})
 
     def convert_output(self, data: AnyT) -> AnyT:
         """Convert outputs to the floating point precision type expected after model's forward.
@@ -123,8 +369,6 @@ class MegatronMixedPrecision(MixedPrecision):
             parallel_state.is_pipeline_last_stage()
 
         """
-        from megatron.core.transformer.module import float16_to_fp32
-
         return float16_to_fp32(data)
 
     def optimizer_step(
@@ -134,42 +378,39 @@ class MegatronMixedPrecision(MixedPrecision):
         closure: Callable[[], Any],
         **kwargs: Any,
     ) -> None:
-        from nemo.core.optim import MainParamsOptimizerWrapper
-
         if not self.amp_O2 and not isinstance(optimizer, MainParamsOptimizerWrapper):
             return super().optimizer_step(optimizer, model, closure, **kwargs)
 
-        if self.scaler is None:
-            assert optimizer.fp32_grad_accumulation, "BF16 uses FP32 grad accumulation"
-            _ = closure()
-            self._after_closure(model, optimizer)
-            return optimizer.step(**kwargs)
-
-        assert not optimizer.fp32_grad_accumulation, "FP16 uses FP16 grad accumulation"
-        closure_result = closure()
-
-        # TODO: Add an option for merged all-reduce
-
-        # cast fp16 grads to fp32 and copy to main grads, which are used for unscale and param update
-        optimizer.copy_model_grads_to_main_grads()
-        # `unscale` after the closure is executed but before the `on_before_optimizer_step` hook.
-        # unscale main (fp32) gradients
-        self.scaler.unscale_(optimizer)
-        self._after_closure(model, optimizer)
-        skipped_backward = closure_result is None
-        # in manual optimization, the closure does not return a value
-        if not isinstance(model, pl.LightningModule) or not model.automatic_optimization or not skipped_backward:
-            # note: the scaler will skip the `optimizer.step` if nonfinite gradients are found
-            self.scaler.step(optimizer, **kwargs)
-            self.scaler.update()
+        return self._megatron_optimizer_step(self, optimizer, model, closure, **kwargs)
+
+    def convert_config(self, config: ConfigT) -> ConfigT:
+        """Enable FP8 in a megatron-core ``TransformerConfig`` when this plugin uses an FP8 precision.
+
+        megatron-core then runs each transformer block under ``te.fp8_autocast``, with the amax
+        reduction group, and recomputes activations with ``te_checkpoint`` so recomputation also
+        runs in FP8.
+
+        """
+        if self.fp8_config is None:
+            return config
+
+        if "fp8_recipe" in self.fp8_config and not hasattr(config, "fp8_recipe"):
+            raise ValueError("The installed megatron-core does not support FP8 current scaling.")
+
+        for key, value in self.fp8_config.items():
+            setattr(config, key, value)
+
+        return config
 
     @contextmanager
     def forward_context(self) -> Generator[None, None, None]:
-        """No explicit precision casting. Inputs are supposed to be manually casted."""
-        try:
+        """No explicit precision casting. Inputs are supposed to be manually casted.
+
+        Autocast is not enabled here, but autocast regions opened in the step without a dtype use
+        ``self.dtype`` rather than the process-wide default.
+        """
+        with torch.autocast(self.device, dtype=self.dtype, enabled=torch.is_autocast_enabled()):
             yield
-        finally:
-            pass
 
 
 __all__ = ["MegatronMixedPrecision"]
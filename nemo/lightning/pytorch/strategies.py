@@ -105,6 +105,9 @@ class MegatronStrategy(DDPStrategy, io.IOMixin):
             config.pipeline_model_parallel_size = self.pipeline_model_parallel_size
             config.virtual_pipeline_model_parallel_size = self.virtual_pipeline_model_parallel_size
             config.sequence_parallel = self.sequence_parallel
+            # e.g. FP8, so megatron-core already sees it while the model is configured
+            if hasattr(self.precision_plugin, "convert_config"):
+                self.precision_plugin.convert_config(config)
             self._mcore_config = config
 
     @override
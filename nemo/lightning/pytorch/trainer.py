@@ -9,7 +9,9 @@ from nemo.lightning.io.mixin import IOMixin
 
 class Trainer(pl.Trainer, IOMixin):
     def io_init(self, **kwargs) -> fdl.Config[Self]:
-        # Each argument of the trainer can be stateful so we copy them
-        cfg_kwargs = {k: deepcopy(v) for k, v in kwargs.items()}
+        # Each argument of the trainer can be stateful so we copy them.
+        # A single deepcopy shares the memo across all arguments, so objects referenced by several
+        # arguments (e.g. a plugin also held by the strategy) are copied once and stay shared.
+        cfg_kwargs = deepcopy(kwargs)
 
         return fdl.Config(type(self), **cfg_kwargs)
@@ -0,0 +1,69 @@
+# Copyright (c) 2024, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from unittest.mock import MagicMock
+
+import pytest
+import pytorch_lightning as pl
+
+from nemo.collections.common.parts.ptl_overrides import (
+    megatron_bf16_optimizer_step,
+    megatron_fp16_optimizer_step,
+    megatron_optimizer_step_fn,
+)
+
+
+def _fp16_step_mocks():
+    calls = MagicMock()
+    plugin = MagicMock()
+    plugin.scaler = calls.scaler
+    plugin._after_closure = calls.after_closure
+    optimizer = calls.optimizer
+    optimizer.fp32_grad_accumulation = False
+    model = MagicMock(spec=pl.LightningModule, automatic_optimization=True)
+    return calls, plugin, optimizer, model
+
+
+@pytest.mark.unit
+def test_optimizer_step_fn():
+    assert megatron_optimizer_step_fn(None) is megatron_bf16_optimizer_step
+    assert megatron_optimizer_step_fn(MagicMock()) is megatron_fp16_optimizer_step
+
+
+@pytest.mark.unit
+def test_fp16_optimizer_step_prefetches_found_inf_before_after_closure():
+    calls, plugin, optimizer, model = _fp16_step_mocks()
+
+    megatron_fp16_optimizer_step(plugin, optimizer, model, lambda: 1.0)
+
+    assert [name for name, _, _ in calls.mock_calls] == [
+        "optimizer.copy_model_grads_to_main_grads",
+        "scaler.unscale_",
+        "scaler.prefetch_found_inf",
+        "after_closure",
+        "scaler.step",
+        "scaler.update",
+    ]
+
+
+@pytest.mark.unit
+def test_fp16_optimizer_step_skipped_backward():
+    calls, plugin, optimizer, model = _fp16_step_mocks()
+
+    megatron_fp16_optimizer_step(plugin, optimizer, model, lambda: None)
+
+    calls.scaler.unscale_.assert_called_once_with(optimizer)
+    calls.after_closure.assert_called_once_with(model, optimizer)
+    calls.scaler.prefetch_found_inf.assert_not_called()
+    calls.scaler.step.assert_not_called()
+    calls.scaler.update.assert_not_called()
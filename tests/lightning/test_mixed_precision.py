@@ -0,0 +1,287 @@
+import copy
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+import torch
+from megatron.core.transformer.module import fp32_to_float16
+from megatron.core.transformer.transformer_config import TransformerConfig
+from torch import nn
+
+from nemo.lightning.pytorch.plugins import mixed_precision
+
+
+class TiedModule(nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.embedding = nn.Embedding(16, 8)
+        self.linear = nn.Linear(8, 16)
+        self.linear.weight = self.embedding.weight
+        self.norm = nn.BatchNorm1d(8)
+        self.register_buffer("scale", torch.rand(8))
+        self.register_buffer("index", torch.arange(8))
+
+
+class CustomApplyModule(nn.Linear):
+    def _apply(self, fn, *args, **kwargs):
+        self.applied = True
+        return super()._apply(fn, *args, **kwargs)
+
+
+class TestForeachCastModule:
+    @pytest.mark.parametrize("dtype", [torch.float16, torch.bfloat16])
+    def test_matches_module_to(self, dtype):
+        module = TiedModule()
+        expected = copy.deepcopy(module).to(dtype)
+
+        mixed_precision._foreach_cast_module_(module, dtype)
+
+        assert module.linear.weight is module.embedding.weight
+        expected_state, state = expected.state_dict(), module.state_dict()
+        assert state.keys() == expected_state.keys()
+        for name, tensor in state.items():
+            assert tensor.dtype == expected_state[name].dtype, name
+            assert torch.equal(tensor, expected_state[name]), name
+        assert module.index.dtype == torch.int64
+        assert module.norm.num_batches_tracked.dtype == torch.int64
+
+    def test_casts_grads(self):
+        module = nn.Linear(4, 4)
+        module(torch.rand(2, 4)).sum().backward()
+        expected = copy.deepcopy(module).half()
+
+        mixed_precision._foreach_cast_module_(module, torch.float16)
+
+        assert module.weight.grad.dtype == torch.float16
+        assert torch.equal(module.weight.grad, expected.weight.grad)
+        assert torch.equal(module.bias.grad, expected.bias.grad)
+
+    def test_casts_in_buckets(self):
+        module = nn.Sequential(nn.Linear(64, 64), nn.Linear(64, 64))
+        expected = copy.deepcopy(module).bfloat16()
+
+        # A bf16 weight and bias take 8 KiB + 128 B, so each layer ends up in a bucket of its own
+        with patch.object(mixed_precision, "_CAST_BUCKET_BYTES", 8 * 1024 + 128):
+            buckets = list(mixed_precision._cast_buckets(list(module.parameters()), torch.bfloat16))
+            mixed_precision._foreach_cast_module_(module, torch.bfloat16)
+
+        assert [len(bucket) for bucket in buckets] == [2, 2]
+        for param, expected_param in zip(module.parameters(), expected.parameters()):
+            assert torch.equal(param, expected_param)
+
+    def test_casted_tensors_do_not_share_storage(self):
+        module = nn.Sequential(nn.Linear(8, 8), nn.Linear(8, 8))
+
+        mixed_precision._foreach_cast_module_(module, torch.bfloat16)
+
+        params = list(module.parameters())
+        assert len({param.untyped_storage().data_ptr() for param in params}) == len(params)
+        for param in params:
+            assert param.untyped_storage().nbytes() == param.numel() * param.element_size()
+
+    def test_falls_back_to_custom_apply(self):
+        module = nn.Sequential(CustomApplyModule(4, 4))
+
+        mixed_precision._foreach_cast_module_(module, torch.float16)
+
+        assert module[0].applied
+        assert module[0].weight.dtype == torch.float16
+
+
+def assert_same_conversion(actual, expected):
+    assert type(actual) is type(expected)
+    if isinstance(expected, (list, tuple)):
+        assert len(actual) == len(expected)
+        for actual_item, expected_item in zip(actual, expected):
+            assert_same_conversion(actual_item, expected_item)
+    elif isinstance(expected, torch.Tensor):
+        assert actual.dtype == expected.dtype
+        assert actual.requires_grad == expected.requires_grad
+        assert torch.equal(actual, expected)
+    else:
+        assert actual is expected
+
+
+class TestConvertInput:
+    @pytest.fixture(params=["16-mixed", "bf16-mixed"])
+    def plugin(self, request):
+        return mixed_precision.MegatronMixedPrecision(precision=request.param)
+
+    @pytest.mark.parametrize(
+        "batch",
+        [
+            torch.rand(2, 3),
+            torch.arange(6),
+            [torch.rand(2), (torch.rand(3), [torch.arange(4), torch.rand(1)]), "tokens", 3],
+            (torch.rand(2).half(), torch.rand(2)),
+            [torch.arange(3), torch.ones(2, dtype=torch.bool)],
+            {"tokens": torch.arange(3), "mask": torch.rand(3)},
+            [{"mask": torch.rand(3)}, torch.rand(3)],
+            None,
+        ],
+    )
+    def test_matches_fp32_to_float16(self, plugin, batch):
+        expected = fp32_to_float16(batch, plugin.float16_convertor)
+
+        assert_same_conversion(plugin.convert_input(batch), expected)
+
+    def test_keeps_non_fp32_tensors(self, plugin):
+        tokens, mask = torch.arange(3), torch.rand(3)
+        batch = {"tokens": tokens, "mask": mask}
+
+        assert plugin.convert_input(batch) is batch
+        assert plugin.convert_input(tokens) is tokens
+        assert plugin.convert_input([tokens])[0] is tokens
+
+    def test_requires_grad_inputs_stay_differentiable(self, plugin):
+        hidden = torch.rand(2, 3, requires_grad=True)
+        batch = [hidden, (torch.rand(3),)]
+        expected = fp32_to_float16(batch, plugin.float16_convertor)
+
+        converted = plugin.convert_input(batch)
+
+        assert_same_conversion(converted, expected)
+        converted[0].float().sum().backward()
+        assert torch.equal(hidden.grad, torch.ones_like(hidden))
+
+
+@pytest.mark.run_only_on('GPU')
+@pytest.mark.parametrize("precision, dtype", [("16-mixed", torch.float16), ("bf16-mixed", torch.bfloat16)])
+def test_forward_context_scopes_autocast_dtype(precision, dtype):
+    plugin = mixed_precision.MegatronMixedPrecision(precision=precision)
+    default_dtype = torch.get_autocast_gpu_dtype()
+
+    with plugin.forward_context():
+        assert not torch.is_autocast_enabled()
+        with torch.autocast("cuda"):
+            assert torch.get_autocast_gpu_dtype() == dtype
+            assert torch.mm(torch.ones(2, 2, device="cuda"), torch.ones(2, 2, device="cuda")).dtype == dtype
+
+    assert torch.get_autocast_gpu_dtype() == default_dtype
+
+
+@pytest.fixture
+def mock_te():
+    with patch.object(mixed_precision, "HAVE_TE", True), patch.object(
+        mixed_precision, "te", MagicMock(), create=True
+    ) as te:
+        yield te
+
+
+def transformer_config():
+    return TransformerConfig(num_layers=2, hidden_size=8, num_attention_heads=2)
+
+
+class FP8Model(nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.layers = nn.ModuleList([nn.Linear(4, 4) for _ in range(3)])
+        self.output_layer = nn.Linear(4, 4)
+        self.config = transformer_config()
+        self.layers[0].config = self.config
+
+    def forward(self, x):
+        for layer in self.layers:
+            x = layer(x)
+        return self.output_layer(x)
+
+
+class TestFP8Precision:
+    @pytest.mark.parametrize(
+        "precision, half_precision, dtype, has_scaler",
+        [
+            ("bf16-with-fp8-mixed", "bf16-mixed", torch.bfloat16, False),
+            ("bf16-with-fp8-current-scaling-mixed", "bf16-mixed", torch.bfloat16, False),
+            ("fp16-with-fp8-mixed", "16-mixed", torch.float16, True),
+        ],
+    )
+    def test_precision(self, mock_te, precision, half_precision, dtype, has_scaler):
+        plugin = mixed_precision.MegatronMixedPrecision(precision=precision)
+
+        assert plugin.precision == half_precision
+        assert plugin.dtype == dtype
+        assert (plugin.scaler is not None) == has_scaler
+        assert plugin.fp8_config is not None
+
+    @pytest.mark.parametrize("precision", ["bf16-with-fp8-mixed", "fp16-with-fp8-mixed"])
+    def test_delayed_scaling_config(self, mock_te, precision):
+        plugin = mixed_precision.MegatronMixedPrecision(precision=precision)
+
+        config = plugin.convert_config(transformer_config())
+
+        assert config.fp8 == "hybrid"
+        assert config.fp8_margin == 0
+        assert config.fp8_amax_history_len == 1024
+        assert config.fp8_amax_compute_algo == "max"
+
+    def test_current_scaling_config(self, mock_te):
+        plugin = mixed_precision.MegatronMixedPrecision(precision="bf16-with-fp8-current-scaling-mixed")
+
+        config = SimpleNamespace(fp8=None, fp8_recipe="delayed")
+        assert plugin.convert_config(config) is config
+        assert config.fp8 == "hybrid"
+        assert config.fp8_recipe == "tensorwise"
+
+        with pytest.raises(ValueError):
+            plugin.convert_config(SimpleNamespace(fp8=None))
+
+    def test_no_fp8_config_without_fp8(self):
+        plugin = mixed_precision.MegatronMixedPrecision(precision="bf16-mixed")
+
+        config = plugin.convert_config(transformer_config())
+
+        assert plugin.fp8_config is None
+        assert not config.fp8
+
+    def test_convert_module_converts_configs(self, mock_te):
+        plugin = mixed_precision.MegatronMixedPrecision(precision="bf16-with-fp8-mixed")
+        model = FP8Model()
+
+        plugin.convert_module(model)
+
+        assert model.config.fp8 == "hybrid"
+        assert model.layers[0].config is model.config
+
+    def test_requires_transformer_engine(self):
+        with patch.object(mixed_precision, "HAVE_TE", False):
+            with pytest.raises(ImportError):
+                mixed_precision.MegatronMixedPrecision(precision="bf16-with-fp8-mixed")
+
+    def test_invalid_precision(self):
+        with pytest.raises(ValueError):
+            mixed_precision.MegatronMixedPrecision(precision="fp8-mixed")
+
+    def test_skip_layer_names(self, mock_te):
+        te = mock_te
+        plugin = mixed_precision.MegatronMixedPrecision(
+            precision="bf16-with-fp8-mixed", fp8_skip_layer_names=["layers.0", "output_*"]
+        )
+        model = FP8Model()
+
+        # Converting twice must not stack the hooks
+        plugin.convert_module(plugin.convert_module(model))
+
+        skipped = {name for name, m in model.named_modules() if hasattr(m, "_fp8_disabled_contexts")}
+        assert skipped == {"layers.0", "output_layer"}
+        assert len(model.layers[0]._forward_pre_hooks) == 1
+        assert len(model.layers[0]._forward_hooks) == 1
+
+        model(torch.rand(2, 4, dtype=torch.bfloat16))
+
+        assert te.fp8_autocast.call_count == 2
+        te.fp8_autocast.assert_called_with(enabled=False)
+        assert te.fp8_autocast.return_value.__enter__.call_count == 2
+        assert te.fp8_autocast.return_value.__exit__.call_count == 2
+        assert model.layers[0]._fp8_disabled_contexts == []
+
+    def test_skip_layer_names_survive_deepcopy(self, mock_te):
+        te = mock_te
+        plugin = mixed_precision.MegatronMixedPrecision(
+            precision="bf16-with-fp8-mixed", fp8_skip_layer_names=["layers.*"]
+        )
+        model = copy.deepcopy(plugin.convert_module(FP8Model()))
+
+        model(torch.rand(2, 4, dtype=torch.bfloat16))
+
+        assert te.fp8_autocast.call_count == 3
+        assert te.fp8_autocast.return_value.__exit__.call_count == 3
@@ -1,5 +1,7 @@
 from unittest.mock import ANY, MagicMock, patch
 
+import pytest
+import torch
 from torch import nn
 
 from nemo.lightning import _strategy_lib  # , DataConfig
@@ -75,6 +77,91 @@ def test_init_model_parallel(mock_mpu, *args):
     )
 
 
+def _grad_scaler_with_found_infs(*found_infs):
+    scaler = _strategy_lib.GradScaler()
+    scaler._lazy_init_scale_growth_tracker(torch.device("cuda"))
+    devices = [torch.device("cuda"), torch.device("cpu")]
+    optimizer_state = {
+        "found_inf_per_device": {
+            device: torch.full((), value, dtype=torch.float32, device=device)
+            for device, value in zip(devices, found_infs)
+        }
+    }
+    return scaler, optimizer_state
+
+
+@pytest.mark.run_only_on('GPU')
+@patch('torch.distributed.all_reduce')
+@patch('megatron.core.parallel_state')
+def test_grad_scaler_steps_without_inf(mock_mpu, mock_all_reduce):
+    scaler, optimizer_state = _grad_scaler_with_found_infs(0.0, 0.0)
+    optimizer = MagicMock()
+
+    scaler._maybe_opt_step(optimizer, optimizer_state)
+
+    optimizer.step.assert_called_once()
+    assert scaler.optimizer_update_skipped is False
+    mock_all_reduce.assert_called_once()
+
+
+@pytest.mark.run_only_on('GPU')
+@patch('torch.distributed.all_reduce')
+@patch('megatron.core.parallel_state')
+def test_grad_scaler_skips_step_on_inf_from_another_device(mock_mpu, mock_all_reduce):
+    scaler, optimizer_state = _grad_scaler_with_found_infs(0.0, 1.0)
+    optimizer = MagicMock()
+
+    scaler._maybe_opt_step(optimizer, optimizer_state)
+
+    optimizer.step.assert_not_called()
+    assert scaler.optimizer_update_skipped is True
+    assert scaler._found_inf_cpu[id(optimizer)].shape == (1,)
+    assert scaler._found_inf_cpu[id(optimizer)].is_pinned()
+
+
+@pytest.mark.run_only_on('GPU')
+@patch('torch.distributed.all_reduce')
+@patch('megatron.core.parallel_state')
+def test_grad_scaler_prefetch_without_found_inf(mock_mpu, mock_all_reduce):
+    scaler, optimizer_state = _grad_scaler_with_found_infs()
+    optimizer = MagicMock()
+    scaler._per_optimizer_states[id(optimizer)] = optimizer_state
+
+    scaler.prefetch_found_inf(optimizer)
+
+    mock_all_reduce.assert_not_called()
+    assert "found_inf_cpu_copied" not in optimizer_state
+
+
+@pytest.mark.run_only_on('GPU')
+@pytest.mark.parametrize("grad_value, should_step", [(1.0, True), (float("inf"), False)])
+@patch('torch.distributed.all_reduce')
+@patch('megatron.core.parallel_state')
+def test_grad_scaler_unscales_main_params_optimizer(mock_mpu, mock_all_reduce, grad_value, should_step):
+    pytest.importorskip("amp_C")
+    from nemo.core.optim import MainParamsOptimizerWrapper
+
+    model = nn.Linear(4, 4).cuda().half()
+    optimizer = MainParamsOptimizerWrapper(torch.optim.SGD(model.parameters(), lr=1.0))
+    scaler = _strategy_lib.GradScaler(init_scale=4.0)
+    for param in model.parameters():
+        param.grad = torch.full_like(param, 4.0 * grad_value)
+    main_params = [param for group in optimizer.param_groups for param in group['params']]
+    expected = [param.detach().clone() - 1.0 if should_step else param.detach().clone() for param in main_params]
+
+    optimizer.copy_model_grads_to_main_grads()
+    scaler.unscale_(optimizer)
+    found_inf_per_device = scaler._per_optimizer_states[id(optimizer)]["found_inf_per_device"]
+    scaler.step(optimizer)
+
+    assert all(found_inf.shape == () for found_inf in found_inf_per_device.values())
+    assert all(param.grad is None for param in model.parameters())
+    assert scaler.optimizer_update_skipped is not should_step
+    for param, expected_param in zip(main_params, expected):
+        assert param.dtype == torch.float32
+        assert torch.equal(param, expected_param)
+
+
 # TODO @chcui uncomment after fabric API is merged
 # @patch('nemo.lightning._strategy_lib.DataLoader', return_value=MagicMock())
 # @patch('megatron.core.parallel_state')